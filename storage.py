@@ -0,0 +1,182 @@
+"""Shared storage layer: cached profile data, project files, activity log.
+
+All file I/O and process-wide caching lives here so the optimizations
+(orjson everywhere, mtime-invalidated caches, atomic writes, append-only
+logging) are applied in exactly one place.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+import json
+import os
+import re
+import threading
+
+import orjson
+import pandas as pd
+
+PROFILE_DATA_FILE = 'profile_data.json'
+ACTIVITY_LOG_FILE = 'activity_log.ndjson' # One JSON entry per line
+
+# Serializes appends to the activity log across concurrent Flask requests.
+_activity_log_lock = threading.Lock()
+
+# Process-wide cache of the profile data, invalidated by file mtime so
+# requests don't re-read and re-parse the file every time.
+profile_lock = threading.RLock()
+_profile_cache = {'mtime': 0, 'data': None, 'users_by_email': {},
+                  'pending_users': [], 'projects_by_name': {}, 'projects_by_code': {}}
+
+# Project files verified to contain clean JSON (path -> mtime_ns), so
+# /api/load can stream their bytes without re-parsing per request.
+_clean_project_files = {}
+
+def orjson_default(obj):
+    """Fallback for types orjson can't serialize natively (NaT, Timestamps)."""
+    if pd.isna(obj):
+        return None
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+# Matches every character that isn't allowed in a project data filename.
+_UNSAFE_FILENAME_RE = re.compile(r'[^A-Za-z0-9 _]')
+
+# The same few project names are requested over and over, so memoize
+# the name -> filename mapping.
+@lru_cache(maxsize=256)
+def get_project_data_file(project_name):
+    """Generates the filename for a project's data."""
+    # Sanitize project name to be a valid filename
+    safe_project_name = _UNSAFE_FILENAME_RE.sub('', project_name).rstrip()
+    return f"{safe_project_name.replace(' ', '_')}_data.json"
+
+def rebuild_profile_indexes():
+    """Rebuilds the lookup indexes kept alongside the cached profile data."""
+    data = _profile_cache['data']
+    users = data.get('users', [])
+    _profile_cache['users_by_email'] = {u['email']: u for u in users}
+    _profile_cache['pending_users'] = [u for u in users if u.get('status') == 'pending']
+    projects = data.get('projects', [])
+    _profile_cache['projects_by_name'] = {p['name']: p for p in projects}
+    _profile_cache['projects_by_code'] = {p['client_access_code']: p for p in projects}
+
+def load_profiles():
+    """Returns the profile data, reloading from disk only when the file has changed."""
+    with profile_lock:
+        mtime = os.stat(PROFILE_DATA_FILE).st_mtime_ns
+        if mtime != _profile_cache['mtime']:
+            with open(PROFILE_DATA_FILE, 'rb') as f:
+                _profile_cache['data'] = orjson.loads(f.read())
+            _profile_cache['mtime'] = mtime
+            rebuild_profile_indexes()
+        return _profile_cache['data']
+
+def save_profiles(profiles):
+    """Atomically writes the profile data and refreshes the in-memory cache."""
+    with profile_lock:
+        tmp_file = PROFILE_DATA_FILE + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(profiles))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, PROFILE_DATA_FILE)
+        _profile_cache['data'] = profiles
+        _profile_cache['mtime'] = os.stat(PROFILE_DATA_FILE).st_mtime_ns
+        rebuild_profile_indexes()
+
+def get_user_by_email(email):
+    """O(1) lookup of a user record from the cached email index."""
+    with profile_lock:
+        load_profiles()
+        return _profile_cache['users_by_email'].get(email)
+
+def get_project_by_name(name):
+    """O(1) lookup of a project record from the cached name index."""
+    with profile_lock:
+        load_profiles()
+        return _profile_cache['projects_by_name'].get(name)
+
+def get_project_by_code(access_code):
+    """O(1) lookup of a project record from the cached access-code index."""
+    with profile_lock:
+        load_profiles()
+        return _profile_cache['projects_by_code'].get(access_code)
+
+def get_pending_users():
+    """Returns the cached list of users awaiting approval."""
+    with profile_lock:
+        load_profiles()
+        return _profile_cache['pending_users']
+
+def log_activity(user_email, project_name, action, details):
+    """Appends an admin's action to the activity log as a single NDJSON line."""
+    log_entry = {
+        "timestamp": datetime.now().isoformat(),
+        "user": user_email,
+        "project": project_name,
+        "action": action,
+        "details": details
+    }
+    line = orjson.dumps(log_entry) + b'\n'
+    with _activity_log_lock:
+        with open(ACTIVITY_LOG_FILE, 'ab') as f:
+            f.write(line)
+
+def log_activities_bulk(entries):
+    """Appends many (user, project, action, details) log entries in one write."""
+    if not entries:
+        return
+    timestamp = datetime.now().isoformat()
+    with _activity_log_lock:
+        with open(ACTIVITY_LOG_FILE, 'ab') as f:
+            f.writelines(
+                orjson.dumps({
+                    "timestamp": timestamp,
+                    "user": user_email,
+                    "project": project_name,
+                    "action": action,
+                    "details": details
+                }) + b'\n'
+                for user_email, project_name, action, details in entries
+            )
+
+def iter_log_lines_reversed(path, chunk_size=64 * 1024):
+    """Yields the lines of a file from last to first, reading in chunks from the end."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        while position > 0:
+            read_size = min(chunk_size, position)
+            position -= read_size
+            f.seek(position)
+            buffer = f.read(read_size) + remainder
+            lines = buffer.split(b'\n')
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
+def ensure_clean_project_file(data_file):
+    """One-shot migration of legacy files with bare NaN tokens to clean JSON."""
+    mtime = os.stat(data_file).st_mtime_ns
+    if _clean_project_files.get(data_file) == mtime:
+        return
+    with open(data_file, 'rb') as f:
+        raw = f.read()
+    try:
+        orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        # Written by an older version via json.dump, which emits NaN
+        # literals; rewrite once so it can be served as-is from now on.
+        # Atomic write: a crash mid-migration can't truncate the file.
+        data = json.loads(raw, parse_constant=lambda _: None)
+        tmp_file = data_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(data, default=orjson_default))
+        os.replace(tmp_file, data_file)
+        mtime = os.stat(data_file).st_mtime_ns
+    _clean_project_files[data_file] = mtime